@@ -55,4 +55,7 @@ fi
 
 # Start the Flask API server using Gunicorn
 echo "Starting Flask API server on port 5000..."
-exec gunicorn --bind 0.0.0.0:5000 --preload --workers 1 sync_manager:app 
\ No newline at end of file
+# --preload imports sync_manager once in the master, which starts the scheduler and runs scheduled syncs;
+# the forked worker only serves the API. A single gthread worker keeps /trigger_sync runs on one bounded
+# sync pool while its threads still answer API requests concurrently.
+exec gunicorn --bind 0.0.0.0:5000 --preload --workers 1 --worker-class gthread --threads ${GUNICORN_THREADS:-8} sync_manager:app 
\ No newline at end of file
@@ -1,5 +1,6 @@
 #!/bin/bash
 set -e
+set -o pipefail
 
 # MySQL sync script
 SRC_HOST="$1"
@@ -17,11 +18,9 @@ TABLES_EXCLUDE="${12}"
 STRUCTURE_ONLY="${13}"
 DROP_TARGET="${14}"
 
-# Temp file for dump
-DUMP_FILE="/tmp/mysql_dump_${SRC_DB}.sql"
-
-# Export options
-EXPORT_OPTS="--single-transaction --quick"
+# Export options (--compress cuts bytes on the wire for remote sources; the 1MB net buffer caps
+# multi-row INSERTs below the 4MB max_allowed_packet default of older target servers)
+EXPORT_OPTS="--single-transaction --quick --compress --net-buffer-length=1048576"
 
 if [ "$STRUCTURE_ONLY" = "true" ]; then
     EXPORT_OPTS="$EXPORT_OPTS --no-data"
@@ -40,19 +39,28 @@ if [ ! -z "$TABLES_EXCLUDE" ]; then
     done
 fi
 
-echo "Exporting from source database..."
-MYSQL_PWD=$SRC_PASS mysqldump -h $SRC_HOST -P $SRC_PORT -u $SRC_USER $EXPORT_OPTS $SRC_DB > $DUMP_FILE
-
-# If drop target is enabled, drop the database and recreate it
-if [ "$DROP_TARGET" = "true" ]; then
+# Drop and recreate the target database
+drop_target() {
     echo "Dropping target database..."
     MYSQL_PWD=$TGT_PASS mysql -h $TGT_HOST -P $TGT_PORT -u $TGT_USER -e "DROP DATABASE IF EXISTS $TGT_DB; CREATE DATABASE $TGT_DB;"
-fi
+}
 
-echo "Importing to target database..."
-MYSQL_PWD=$TGT_PASS mysql -h $TGT_HOST -P $TGT_PORT -u $TGT_USER $TGT_DB < $DUMP_FILE
+# Consumer side of the pipe: mysqldump only writes its header once it has connected to the source,
+# so the target is dropped after the first line arrives and a failed export leaves it intact
+import_dump() {
+    if ! IFS= read -r FIRST_LINE && [ -z "$FIRST_LINE" ]; then
+        echo "Export produced no output; target database left untouched." >&2
+        return 1
+    fi
+    if [ "$DROP_TARGET" = "true" ]; then
+        drop_target
+    fi
+    # --compress here too: the import leg to a remote target carries the same uncompressed SQL text
+    { printf '%s\n' "$FIRST_LINE"; cat; } | MYSQL_PWD=$TGT_PASS mysql --compress -h $TGT_HOST -P $TGT_PORT -u $TGT_USER $TGT_DB
+}
 
-echo "Cleaning up..."
-rm -f $DUMP_FILE
+# Pipe the dump into the target instead of spilling it to a temp file (pipefail catches export errors)
+echo "Exporting from source and importing to target database..."
+MYSQL_PWD=$SRC_PASS mysqldump -h $SRC_HOST -P $SRC_PORT -u $SRC_USER $EXPORT_OPTS $SRC_DB | import_dump
 
 echo "Sync completed!" 
\ No newline at end of file
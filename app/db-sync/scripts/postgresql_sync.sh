@@ -1,5 +1,6 @@
 #!/bin/bash
 set -e
+set -o pipefail
 
 # PostgreSQL sync script
 SRC_HOST="$1"
@@ -16,9 +17,7 @@ TABLES_ONLY="${11}"
 TABLES_EXCLUDE="${12}"
 STRUCTURE_ONLY="${13}"
 DROP_TARGET="${14}"
-
-# Temp file for dump
-DUMP_FILE="/tmp/pg_dump_${SRC_DB}.sql"
+PARALLEL_JOBS="${15:-1}"
 
 # Export options
 EXPORT_OPTS="--no-owner --no-acl"
@@ -27,9 +26,6 @@ if [ "$STRUCTURE_ONLY" = "true" ]; then
     EXPORT_OPTS="$EXPORT_OPTS --schema-only"
 fi
 
-# Set up environment for source connection
-export PGPASSWORD=$SRC_PASS
-
 # Table filtering for PostgreSQL
 TABLE_ARGS=""
 if [ ! -z "$TABLES_ONLY" ]; then
@@ -44,23 +40,45 @@ if [ ! -z "$TABLES_EXCLUDE" ]; then
     done
 fi
 
-echo "Exporting from source database..."
-pg_dump -h $SRC_HOST -p $SRC_PORT -U $SRC_USER $EXPORT_OPTS $TABLE_ARGS $SRC_DB > $DUMP_FILE
+# Drop and recreate the target database
+drop_target() {
+    echo "Dropping target database..."
+    PGPASSWORD=$TGT_PASS psql -h $TGT_HOST -p $TGT_PORT -U $TGT_USER -c "DROP DATABASE IF EXISTS $TGT_DB;" postgres
+    PGPASSWORD=$TGT_PASS psql -h $TGT_HOST -p $TGT_PORT -U $TGT_USER -c "CREATE DATABASE $TGT_DB;" postgres
+}
 
-# Set up environment for target connection
-export PGPASSWORD=$TGT_PASS
+# Consumer side of the pipe: pg_dump only writes once it has connected and read the source catalog,
+# so the target is dropped after the first line arrives and a failed export leaves it intact
+import_dump() {
+    if ! IFS= read -r FIRST_LINE && [ -z "$FIRST_LINE" ]; then
+        echo "Export produced no output; target database left untouched." >&2
+        return 1
+    fi
+    if [ "$DROP_TARGET" = "true" ]; then
+        drop_target
+    fi
+    { printf '%s\n' "$FIRST_LINE"; cat; } | PGPASSWORD=$TGT_PASS psql -h $TGT_HOST -p $TGT_PORT -U $TGT_USER -d $TGT_DB
+}
 
-# If drop target is enabled, drop the database and recreate it
-if [ "$DROP_TARGET" = "true" ]; then
-    echo "Dropping target database..."
-    psql -h $TGT_HOST -p $TGT_PORT -U $TGT_USER -c "DROP DATABASE IF EXISTS $TGT_DB;" postgres
-    psql -h $TGT_HOST -p $TGT_PORT -U $TGT_USER -c "CREATE DATABASE $TGT_DB;" postgres
-fi
+if [ "$PARALLEL_JOBS" -gt 1 ]; then
+    # Directory-format dump/restore processes tables in parallel; it needs a dump dir, so it can't be piped
+    DUMP_DIR="/tmp/pg_dump_${SRC_DB}_$$"
+    trap 'rm -rf "$DUMP_DIR"' EXIT
+
+    echo "Exporting from source database with $PARALLEL_JOBS jobs..."
+    PGPASSWORD=$SRC_PASS pg_dump -h $SRC_HOST -p $SRC_PORT -U $SRC_USER $EXPORT_OPTS $TABLE_ARGS -Fd -j $PARALLEL_JOBS -f "$DUMP_DIR" $SRC_DB
 
-echo "Importing to target database..."
-psql -h $TGT_HOST -p $TGT_PORT -U $TGT_USER -d $TGT_DB -f $DUMP_FILE
+    # Only touch the target once the dump has completed
+    if [ "$DROP_TARGET" = "true" ]; then
+        drop_target
+    fi
 
-echo "Cleaning up..."
-rm -f $DUMP_FILE
+    echo "Importing to target database with $PARALLEL_JOBS jobs..."
+    PGPASSWORD=$TGT_PASS pg_restore -h $TGT_HOST -p $TGT_PORT -U $TGT_USER -d $TGT_DB --no-owner --no-acl -j $PARALLEL_JOBS "$DUMP_DIR"
+else
+    # Pipe the dump into the target instead of spilling it to a temp file (pipefail catches export errors)
+    echo "Exporting from source and importing to target database..."
+    PGPASSWORD=$SRC_PASS pg_dump -h $SRC_HOST -p $SRC_PORT -U $SRC_USER $EXPORT_OPTS $TABLE_ARGS $SRC_DB | import_dump
+fi
 
 echo "Sync completed!" 
\ No newline at end of file
@@ -15,15 +15,26 @@ from apscheduler.triggers.cron import CronTrigger
 from datetime import datetime, timezone
 import subprocess
 import sys
+import shutil
 import json
+import functools
+from collections import deque
+import orjson
 import requests
-from typing import Dict, List, Optional, Union, Any, Tuple
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from typing import Dict, List, Optional, Union, Any, Tuple, Deque, IO
 import psutil
-from flask import Flask, jsonify, request
+from flask import Flask, request
 from flask_cors import CORS
 import random
 import threading
+from concurrent.futures import ThreadPoolExecutor
 import sqlite3
+import queue
+import fcntl
+import socket
+from contextlib import contextmanager
 
 # Cryptography imports
 import hashlib 
@@ -47,12 +58,36 @@ logger = logging.getLogger(__name__)
 app = Flask(__name__) # Gunicorn will look for this 'app' object
 CORS(app, resources={r"/api/*": {"origins": "*"}})
 
+def json_response(payload: Any, status: int = 200):
+    """Drop-in for jsonify() that serializes with orjson's C encoder."""
+    return app.response_class(orjson.dumps(payload), status=status, mimetype='application/json')
+
 # --- APScheduler Global Instance ---
 scheduler = BackgroundScheduler(daemon=True) # daemon=True allows app to exit even if scheduler thread is running
 
 # --- Global Constants ---
 BACKEND_DB_PATH = "/app/data/mole.db"
+SYNC_LOCK_DIR = os.getenv("SYNC_LOCK_DIR", "/app/data/locks") # Must sit on a volume shared by all replicas
 NODE_BACKEND_JOB_STATUS_URL = os.getenv("NODE_CALLBACK_URL", "http://backend:3001/api/sync/job-status-update")
+SYNC_MAX_WORKERS = int(os.getenv("SYNC_MAX_WORKERS", 4))
+PG_SYNC_JOBS = int(os.getenv("PG_SYNC_JOBS", max(1, (os.cpu_count() or 2) // 2))) # >1 enables parallel directory-format dump/restore
+
+# --- Engine Normalization ---
+ENGINE_ALIASES = {"postgres": "postgresql"} # Same aliases the Node.js backend accepts
+
+# --- Sync Worker Pool ---
+# Bounds concurrent syncs so jobs firing together don't start a pg_dump stampede; extra syncs wait in the queue.
+sync_executor = ThreadPoolExecutor(max_workers=SYNC_MAX_WORKERS, thread_name_prefix="sync-worker")
+
+# --- Node.js Callback Session ---
+# Shared so job-status callbacks reuse keep-alive connections to the backend instead of a new TCP handshake per sync.
+def _make_callback_session() -> requests.Session:
+    session = requests.Session()
+    session.mount('http://', HTTPAdapter(pool_connections=4, pool_maxsize=SYNC_MAX_WORKERS, max_retries=Retry(total=2, backoff_factor=0.1)))
+    session.mount('https://', HTTPAdapter(pool_connections=4, pool_maxsize=SYNC_MAX_WORKERS, max_retries=Retry(total=2, backoff_factor=0.1)))
+    return session
+
+node_callback_session = _make_callback_session()
 
 # --- Key Derivation for Decryption (Matches Node.js) ---
 ENCRYPTION_KEY_RAW = os.getenv("MOLE_ENCRYPTION_KEY", 'a-default-key-that-should-be-changed-in-prod')
@@ -60,75 +95,258 @@ hashed_key_bytes = hashlib.sha256(ENCRYPTION_KEY_RAW.encode('utf-8')).digest()
 hashed_key_hex = binascii.hexlify(hashed_key_bytes).decode('utf-8')
 ENCRYPTION_KEY_FOR_CIPHER = hashed_key_hex[:32].encode('utf-8') 
 IV_LENGTH = 16 # Bytes
+# Built once so each decrypt only has to construct the per-call CBC mode
+AES_ALGORITHM = algorithms.AES(ENCRYPTION_KEY_FOR_CIPHER)
+CRYPTO_BACKEND = default_backend()
+PKCS7_PADDING = padding.PKCS7(algorithms.AES.block_size)
 
 # --- Decryption Function ---
+# Ciphertexts are static per connection, so repeated syncs hit the cache instead of redoing AES-CBC.
+# Keyed on the full iv:ciphertext string; a changed password produces a new key, so no invalidation is needed.
+# Failures raise, and lru_cache doesn't store exceptions, so only successful plaintexts are cached.
+@functools.lru_cache(maxsize=256)
+def _decrypt_password_cached(encrypted_text_with_iv: str) -> str:
+    if encrypted_text_with_iv.index(':') != IV_LENGTH * 2: raise ValueError("IV has an unexpected length")
+    raw = bytes.fromhex(encrypted_text_with_iv.replace(':', '', 1)) # IV has a fixed width, so decode once and slice
+    if len(raw) <= IV_LENGTH or (len(raw) - IV_LENGTH) % IV_LENGTH: raise ValueError("Ciphertext is not a whole number of AES blocks")
+    iv, encrypted_data = raw[:IV_LENGTH], raw[IV_LENGTH:]
+    # Whole ciphertext goes through OpenSSL's (AES-NI) CBC in a single update call
+    decryptor = Cipher(AES_ALGORITHM, modes.CBC(iv), backend=CRYPTO_BACKEND).decryptor()
+    decrypted_padded = decryptor.update(encrypted_data) + decryptor.finalize()
+    unpadder = PKCS7_PADDING.unpadder()
+    unpadded_data = unpadder.update(decrypted_padded) + unpadder.finalize()
+    return unpadded_data.decode('utf-8')
+
 def decrypt_password(encrypted_text_with_iv: str) -> Optional[str]:
     if not encrypted_text_with_iv: return ""
     if ':' not in encrypted_text_with_iv:
         logger.warning(f"Password format invalid for decryption: {encrypted_text_with_iv[:20]}...")
         return None 
     try:
-        iv_hex, encrypted_hex = encrypted_text_with_iv.split(':', 1)
-        if len(iv_hex) != IV_LENGTH * 2: return None
-        iv = binascii.unhexlify(iv_hex)
-        encrypted_data = binascii.unhexlify(encrypted_hex)
-        cipher = Cipher(algorithms.AES(ENCRYPTION_KEY_FOR_CIPHER), modes.CBC(iv), backend=default_backend())
-        decryptor = cipher.decryptor()
-        decrypted_padded = decryptor.update(encrypted_data) + decryptor.finalize()
-        unpadder = padding.PKCS7(algorithms.AES.block_size).unpadder()
-        unpadded_data = unpadder.update(decrypted_padded) + unpadder.finalize()
-        return unpadded_data.decode('utf-8')
+        return _decrypt_password_cached(encrypted_text_with_iv)
     except Exception as e:
         logger.error(f"Decryption failed: {e}", exc_info=True)
         return None
 
+# --- Task Config Parsing ---
+@functools.lru_cache(maxsize=256)
+def parse_task_tables(tables_json: str) -> Tuple[str, ...]:
+    """Parse the JSON `tables` column once per distinct value; a tuple so cached results can't be mutated."""
+    return tuple(json.loads(tables_json))
+
+# --- Backend DB Connection Pool ---
+# Connections are reused across reloads and sync log writes instead of being opened per call.
+DB_POOL_SIZE = 4
+_db_pool: "queue.LifoQueue[sqlite3.Connection]" = queue.LifoQueue(maxsize=DB_POOL_SIZE)
+
+def _open_db_connection() -> sqlite3.Connection:
+    # mode=rw refuses to create a missing DB, replacing a separate (racy) os.path.exists check
+    try:
+        conn = sqlite3.connect(f"file:{BACKEND_DB_PATH}?mode=rw", uri=True, check_same_thread=False) # Pooled connections move between scheduler threads
+    except sqlite3.OperationalError as e:
+        logger.error(f"DB not found: {BACKEND_DB_PATH} ({e})")
+        raise FileNotFoundError(f"DB not found: {BACKEND_DB_PATH}") from e
+    conn.row_factory = sqlite3.Row
+    # WAL is persisted in the DB file, so the Node.js backend shares it: readers no longer block on our log writes.
+    # The remaining pragmas are per-connection and only affect this process.
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA temp_store=MEMORY")
+    conn.execute("PRAGMA mmap_size=268435456")
+    conn.execute("PRAGMA cache_size=-20000")
+    return conn
+
+@contextmanager
+def db_connection():
+    """Borrow a pooled connection; the block runs in a transaction that commits on success."""
+    try: conn = _db_pool.get_nowait()
+    except queue.Empty: conn = _open_db_connection()
+    try:
+        with conn:
+            yield conn
+    finally:
+        try: _db_pool.put_nowait(conn)
+        except queue.Full: conn.close()
+
+# --- Cross-Process Sync Guards ---
+# Every replica's scheduler fires the same job. A per-fire claim marker lets exactly one replica run each fire,
+# and a per-task flock held for the whole run keeps manual and scheduled runs of a task from overlapping.
+SYNC_CLAIM_TTL_SECONDS = 120 # Claim markers only need to outlive the fire minute they cover
+
+def claim_scheduled_fire(task_id: int, fire_minute: int) -> bool:
+    """Atomically create the marker for this (task, fire minute); False if another replica already claimed it."""
+    try:
+        os.makedirs(SYNC_LOCK_DIR, exist_ok=True)
+        now = time.time()
+        with os.scandir(SYNC_LOCK_DIR) as entries: # Expire old markers for this task
+            for entry in entries:
+                if entry.name.startswith(f"dbtask_{task_id}.") and entry.name.endswith(".claim"):
+                    try:
+                        if now - entry.stat().st_mtime > SYNC_CLAIM_TTL_SECONDS: os.unlink(entry.path)
+                    except FileNotFoundError: pass # Expired by another replica
+        fd = os.open(os.path.join(SYNC_LOCK_DIR, f"dbtask_{task_id}.{fire_minute}.claim"), os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+    except FileExistsError:
+        return False
+    except OSError as e:
+        logger.warning(f"[TASK {task_id}] Could not write sync claim marker, running without cross-replica dedup: {e}")
+        return True
+    with os.fdopen(fd, 'w') as marker: marker.write(f"{socket.gethostname()} {os.getpid()}\n")
+    return True
+
+def acquire_task_lock(task_id: int) -> Tuple[bool, Optional[IO]]:
+    """Non-blocking flock per task. Returns (acquired, lock_file); closing lock_file releases the lock."""
+    try:
+        os.makedirs(SYNC_LOCK_DIR, exist_ok=True)
+        lock_file = open(os.path.join(SYNC_LOCK_DIR, f"dbtask_{task_id}.lock"), 'w')
+    except OSError as e:
+        logger.warning(f"[TASK {task_id}] Could not open sync lock file, running without cross-process lock: {e}")
+        return True, None
+    try: fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        lock_file.close()
+        return False, None
+    return True, lock_file
+
+@contextmanager
+def task_run_lock(task_id: int):
+    """Yields False when another run of the task (any process or replica) holds its lock."""
+    acquired, lock_file = acquire_task_lock(task_id)
+    try:
+        yield acquired
+    finally:
+        if lock_file: lock_file.close()
+
 # --- Metrics Collection --- (Simplified for brevity in this edit)
-metrics_history: Dict[str, List[Dict[str, Union[float, int]]]] = {'cpu': [], 'memory': []}
+# Recorded on demand by the process serving the API (see record_metrics_if_due): under gunicorn --preload a
+# scheduler job would fill the master's history, while the worker answering requests only has its fork-time copy.
 MAX_HISTORY = 60
+METRICS_SAMPLE_SECONDS = 60
+metrics_recorded_at = float('-inf') # time.monotonic() of the last recorded sample
+metrics_lock = threading.Lock()
+# Ring buffers: appending past MAX_HISTORY drops the oldest sample in O(1)
+metrics_history: Dict[str, Deque[Dict[str, Union[float, int]]]] = {'cpu': deque(maxlen=MAX_HISTORY), 'memory': deque(maxlen=MAX_HISTORY)}
 def collect_metrics():
     try:
-        cpu = psutil.cpu_percent(interval=0.1); mem = psutil.virtual_memory().percent
+        snapshot = get_system_info_snapshot() # Shares the cached CPU reading; a second cpu_percent() caller would reset its baseline
         ts = time.time() * 1000
-        metrics_history['cpu'].append({'timestamp': ts, 'value': round(cpu, 1)})
-        metrics_history['memory'].append({'timestamp': ts, 'value': round(mem, 1)})
-        if len(metrics_history['cpu']) > MAX_HISTORY: metrics_history['cpu'].pop(0)
-        if len(metrics_history['memory']) > MAX_HISTORY: metrics_history['memory'].pop(0)
+        metrics_history['cpu'].append({'timestamp': ts, 'value': snapshot['cpuUsage']})
+        metrics_history['memory'].append({'timestamp': ts, 'value': snapshot['memoryUsagePercent']})
     except Exception as e: logger.error(f"Metrics error: {e}")
 
+def record_metrics_if_due():
+    global metrics_recorded_at
+    if time.monotonic() - metrics_recorded_at < METRICS_SAMPLE_SECONDS: return
+    with metrics_lock:
+        if time.monotonic() - metrics_recorded_at < METRICS_SAMPLE_SECONDS: return # Another request just recorded one
+        collect_metrics()
+        metrics_recorded_at = time.monotonic()
+
+# --- System Info Sampling ---
+# /api/system/info is polled by the dashboard; readings are cached for SYSTEM_INFO_SAMPLE_SECONDS and refreshed
+# on demand by the process serving the request (under gunicorn --preload the scheduler lives in the master, not the worker).
+SYSTEM_INFO_SAMPLE_SECONDS = 2
+BOOT_TIME = psutil.boot_time() # Fixed for the life of the host
+system_info_snapshot: Dict[str, Any] = {}
+system_info_sampled_at = 0.0 # time.monotonic() of the last sample
+system_info_lock = threading.Lock()
+psutil.cpu_percent(interval=None) # Prime the counter so later non-blocking calls report usage since the previous sample
+
+def sample_system_info() -> Dict[str, Any]:
+    global system_info_snapshot, system_info_sampled_at
+    memory_info = psutil.virtual_memory()
+    disk_info = psutil.disk_usage('/') # For root disk. Change path if needed.
+    swap_info = psutil.swap_memory()
+    snapshot = {
+        "cpuUsage": round(psutil.cpu_percent(interval=None), 1),
+        "memoryUsagePercent": round(memory_info.percent, 1),
+        "memoryUsed": f"{round(memory_info.used / (1024**3), 1)} GB",
+        "memoryTotal": f"{round(memory_info.total / (1024**3), 1)} GB",
+        "diskUsagePercent": round(disk_info.percent, 1),
+        "diskUsed": f"{round(disk_info.used / (1024**3), 1)} GB",
+        "diskTotal": f"{round(disk_info.total / (1024**3), 1)} GB",
+        "swapUsagePercent": round(swap_info.percent, 1),
+        "swapUsed": f"{round(swap_info.used / (1024**3), 1)} GB",
+        "swapTotal": f"{round(swap_info.total / (1024**3), 1)} GB",
+    }
+    system_info_snapshot = snapshot # Single rebinding, so readers always see a complete snapshot
+    system_info_sampled_at = time.monotonic()
+    return snapshot
+
+def get_system_info_snapshot() -> Dict[str, Any]:
+    """Return the cached snapshot, resampling once it is older than SYSTEM_INFO_SAMPLE_SECONDS."""
+    if time.monotonic() - system_info_sampled_at >= SYSTEM_INFO_SAMPLE_SECONDS:
+        with system_info_lock:
+            if time.monotonic() - system_info_sampled_at >= SYSTEM_INFO_SAMPLE_SECONDS: # Another request may have just refreshed it
+                sample_system_info()
+    return system_info_snapshot
+
+# --- Sync Task Queries ---
+# Module-level constants: identical statement text on a pooled connection hits sqlite3's prepared-statement cache.
+SYNC_TASK_SELECT_SQL = """
+SELECT st.id as task_id, st.name as task_name, st.schedule, st.tables,
+       s_conn.id as source_id, s_conn.name as source_name, s_conn.engine as source_engine,
+       s_conn.host as source_host, s_conn.port as source_port, s_conn.database as source_database,
+       s_conn.username as source_username, s_conn.encrypted_password as source_encrypted_password, s_conn.ssl_enabled as source_ssl_enabled,
+       t_conn.id as target_id, t_conn.name as target_name, t_conn.engine as target_engine,
+       t_conn.host as target_host, t_conn.port as target_port, t_conn.database as target_database,
+       t_conn.username as target_username, t_conn.encrypted_password as target_encrypted_password, t_conn.ssl_enabled as target_ssl_enabled
+FROM sync_tasks st
+JOIN database_connections s_conn ON st.source_connection_id = s_conn.id
+JOIN database_connections t_conn ON st.target_connection_id = t_conn.id
+"""
+FETCH_SCHEDULED_TASKS_SQL = SYNC_TASK_SELECT_SQL + "WHERE st.enabled = 1 AND st.schedule IS NOT NULL AND st.schedule != 'never';"
+FETCH_SINGLE_TASK_SQL = SYNC_TASK_SELECT_SQL + "WHERE st.id = ? AND st.enabled = 1;"
+
+# --- Crontab Schedules ---
+# Crontab numbers weekdays from Sunday (0 or 7) while APScheduler's CronTrigger numbers them from Monday,
+# so the day-of-week field is expanded and passed as names instead of via CronTrigger.from_crontab.
+CRON_WEEKDAY_NAMES = ('sun', 'mon', 'tue', 'wed', 'thu', 'fri', 'sat')
+
+def _cron_weekday_number(token: str) -> int:
+    if token.isdigit():
+        if int(token) > 7: raise ValueError(f"Day of week out of range: {token}")
+        return int(token)
+    try: return CRON_WEEKDAY_NAMES.index(token[:3].lower())
+    except ValueError: raise ValueError(f"Invalid day of week: {token}") from None
+
+def crontab_day_of_week(field: str) -> str:
+    """Translate a crontab day-of-week field (e.g. "0", "1-5", "*/2", "sat,7") into APScheduler weekday names."""
+    if field in ('*', '?'): return '*'
+    days = set()
+    for part in field.split(','):
+        base, _, step_str = part.partition('/')
+        step = int(step_str) if step_str else 1
+        if base == '*': start, end = 0, 6
+        elif '-' in base:
+            first, last = base.split('-', 1)
+            start, end = _cron_weekday_number(first), _cron_weekday_number(last)
+        else:
+            start = _cron_weekday_number(base)
+            end = 7 if step_str else start # "n/step" runs from n to the end of the week
+        if step < 1 or start > end: raise ValueError(f"Invalid day of week: {part}")
+        days.update(day % 7 for day in range(start, end + 1, step))
+    return ','.join(CRON_WEEKDAY_NAMES[day] for day in sorted(days))
+
+def crontab_to_trigger(expression: str) -> CronTrigger:
+    minute, hour, day, month, day_of_week = expression.split()
+    return CronTrigger(minute=minute, hour=hour, day=day, month=month, day_of_week=crontab_day_of_week(day_of_week))
+
 # --- DatabaseSync Class (Handles scheduling logic) ---
 class DatabaseSync:
     def __init__(self):
         logger.info("DatabaseSync instance initializing...")
+        self._task_hashes: Dict[str, bytes] = {} # job_id -> hash of the task row it was last scheduled from
+        self._active_task_ids: set = set() # Tasks queued or running on sync_executor
+        self._active_task_ids_lock = threading.Lock()
         self.setup_jobs() 
         self._schedule_periodic_reload()
 
-    def _get_db_connection(self):
-        if not os.path.exists(BACKEND_DB_PATH):
-            logger.error(f"DB not found: {BACKEND_DB_PATH}")
-            raise FileNotFoundError(f"DB not found: {BACKEND_DB_PATH}")
-        conn = sqlite3.connect(BACKEND_DB_PATH)
-        conn.row_factory = sqlite3.Row
-        return conn
-
     def _fetch_sync_tasks_from_db(self) -> List[Dict]:
         tasks = []
         try:
-            with self._get_db_connection() as conn:
+            with db_connection() as conn:
                 cursor = conn.cursor()
-                query = """
-                SELECT st.id as task_id, st.name as task_name, st.schedule, st.tables,
-                       s_conn.id as source_id, s_conn.name as source_name, s_conn.engine as source_engine, 
-                       s_conn.host as source_host, s_conn.port as source_port, s_conn.database as source_database, 
-                       s_conn.username as source_username, s_conn.encrypted_password as source_encrypted_password, s_conn.ssl_enabled as source_ssl_enabled,
-                       t_conn.id as target_id, t_conn.name as target_name, t_conn.engine as target_engine, 
-                       t_conn.host as target_host, t_conn.port as target_port, t_conn.database as target_database, 
-                       t_conn.username as target_username, t_conn.encrypted_password as target_encrypted_password, t_conn.ssl_enabled as target_ssl_enabled
-                FROM sync_tasks st
-                JOIN database_connections s_conn ON st.source_connection_id = s_conn.id
-                JOIN database_connections t_conn ON st.target_connection_id = t_conn.id
-                WHERE st.enabled = 1 AND st.schedule IS NOT NULL AND st.schedule != 'never'; 
-                """
-                cursor.execute(query)
+                cursor.execute(FETCH_SCHEDULED_TASKS_SQL)
                 rows = cursor.fetchall()
                 for row in rows: tasks.append(dict(row))
             logger.info(f"Fetched {len(tasks)} scheduled tasks from DB.")
@@ -138,22 +356,9 @@ class DatabaseSync:
     def _fetch_single_task_from_db(self, task_id_to_fetch: int) -> Optional[Dict]:
         task = None
         try:
-            with self._get_db_connection() as conn:
+            with db_connection() as conn:
                 cursor = conn.cursor()
-                query = """
-                SELECT st.id as task_id, st.name as task_name, st.schedule, st.tables,
-                       s_conn.id as source_id, s_conn.name as source_name, s_conn.engine as source_engine, 
-                       s_conn.host as source_host, s_conn.port as source_port, s_conn.database as source_database, 
-                       s_conn.username as source_username, s_conn.encrypted_password as source_encrypted_password, s_conn.ssl_enabled as source_ssl_enabled,
-                       t_conn.id as target_id, t_conn.name as target_name, t_conn.engine as target_engine, 
-                       t_conn.host as target_host, t_conn.port as target_port, t_conn.database as target_database, 
-                       t_conn.username as target_username, t_conn.encrypted_password as target_encrypted_password, t_conn.ssl_enabled as target_ssl_enabled
-                FROM sync_tasks st
-                JOIN database_connections s_conn ON st.source_connection_id = s_conn.id
-                JOIN database_connections t_conn ON st.target_connection_id = t_conn.id
-                WHERE st.id = ? AND st.enabled = 1; 
-                """
-                cursor.execute(query, (task_id_to_fetch,))
+                cursor.execute(FETCH_SINGLE_TASK_SQL, (task_id_to_fetch,))
                 row = cursor.fetchone()
                 if row:
                     task = dict(row)
@@ -193,27 +398,69 @@ class DatabaseSync:
                     'username': task_config['target_username'], 'password': task_config['target_encrypted_password'], 
                     'ssl_enabled': task_config['target_ssl_enabled']
                 },
-                'tables': json.loads(task_config['tables']) if task_config['tables'] else None
+                'tables': list(parse_task_tables(task_config['tables'])) if task_config['tables'] else None
             }
             logger.info(f"[WRAPPER - TASK {task_id}] Payload constructed. Calling perform_database_sync.")
             perform_database_sync(sync_payload) # Call the original global sync logic
         except Exception as e_payload:
             logger.error(f"[WRAPPER - TASK {task_id}] Failed to construct payload or call perform_database_sync: {e_payload}", exc_info=True)
-            start_time = datetime.now(timezone.utc)
-            update_sync_log(task_id, start_time, datetime.now(timezone.utc), "error", f"Wrapper error: {e_payload}", 0)
+            failed_at = datetime.now(timezone.utc)
+            update_sync_log(task_id, failed_at, failed_at, "error", f"Wrapper error: {e_payload}", 0)
+
+    def _submit_sync(self, task_id: int):
+        # Scheduler entry point: bound method + args=[task_id] instead of a per-job lambda closure.
+        # The actual sync execution (perform_database_sync) is called within the wrapper.
+        # The scheduler job returns as soon as the sync is queued, so APScheduler's max_instances no longer
+        # prevents overlap; skip the fire if this task's previous sync hasn't finished yet.
+        with self._active_task_ids_lock:
+            if task_id in self._active_task_ids:
+                logger.warning(f"[TASK {task_id}] Previous sync still queued or running. Skipping this run.")
+                return
+            self._active_task_ids.add(task_id)
+        # Claimed at fire time, before queueing, so a replica whose copy waits in sync_executor can't rerun this fire later.
+        # Keyed on the wall-clock minute, which only matches across replicas for clock-aligned (cron) triggers.
+        fire_minute = int(time.time() // 60)
+        if not claim_scheduled_fire(task_id, fire_minute):
+            logger.info(f"[TASK {task_id}] This run was already claimed by another replica. Skipping.")
+            self._release_task(task_id)
+            return
+        future = sync_executor.submit(self._run_locked_sync, task_id)
+        future.add_done_callback(lambda _: self._release_task(task_id))
+
+    def _run_locked_sync(self, task_id: int):
+        # Held for the whole run, so a long previous run or a manual /trigger_sync run of the task isn't overlapped
+        with task_run_lock(task_id) as acquired:
+            if not acquired:
+                logger.warning(f"[TASK {task_id}] Sync already running in another process. Skipping this run.")
+                return
+            self._perform_database_sync_wrapper(task_id)
+
+    def _release_task(self, task_id: int):
+        with self._active_task_ids_lock:
+            self._active_task_ids.discard(task_id)
+
+    # Schedule frequency -> trigger factory, looked up once per task instead of walking an if/elif chain
+    _TRIGGER_FACTORIES = {
+        "hourly": lambda: CronTrigger(minute=0), # On the hour, so every replica fires in the same minute (see claim_scheduled_fire)
+        "daily": lambda: CronTrigger(hour=2), # Default daily at 2 AM
+        "weekly": lambda: CronTrigger(day_of_week='mon', hour=2), # Default weekly Mon at 2 AM
+    }
 
     def _create_trigger_from_schedule(self, schedule_frequency: str, task_id: int) -> Optional[Union[IntervalTrigger, CronTrigger]]:
-        if schedule_frequency == "hourly":
-            return IntervalTrigger(hours=1)
-        elif schedule_frequency == "daily":
-            return CronTrigger(hour=2) # Default daily at 2 AM
-        elif schedule_frequency == "weekly":
-            return CronTrigger(day_of_week='mon', hour=2) # Default weekly Mon at 2 AM
-        else:
+        trigger_factory = self._TRIGGER_FACTORIES.get(schedule_frequency)
+        if trigger_factory is None and len(schedule_frequency.split()) == 5: # Standard crontab expression, e.g. "*/5 * * * *"
+            try:
+                return crontab_to_trigger(schedule_frequency)
+            except ValueError as e:
+                logger.warning(f"Invalid cron schedule '{schedule_frequency}' for task {task_id}: {e}")
+                return None
+        if trigger_factory is None:
             logger.warning(f"Cannot create trigger for unsupported schedule: {schedule_frequency} for task {task_id}")
             return None
+        return trigger_factory()
 
     def _schedule_tasks(self, tasks_to_schedule: List[Dict], overwrite: bool = False):
+        existing_jobs = {job.id: job for job in scheduler.get_jobs()} # One jobstore scan instead of get_job() per task
         for task_config in tasks_to_schedule:
             try:
                 task_id = task_config['task_id']
@@ -223,22 +470,23 @@ class DatabaseSync:
 
                 if schedule_frequency == 'never':
                     # If task is set to 'never', ensure it's removed if it exists
-                    existing_job = scheduler.get_job(job_id)
+                    existing_job = existing_jobs.get(job_id)
                     if existing_job:
                         logger.info(f"Task {task_name} ({job_id}) schedule is 'never'. Removing existing job.")
                         scheduler.remove_job(job_id)
+                    self._task_hashes.pop(job_id, None)
+                    continue
+
+                # Unchanged task row and job still present: nothing to do, leave the jobstore (and next run time) alone
+                task_hash = hashlib.blake2b(repr(sorted(task_config.items())).encode('utf-8'), digest_size=16).digest()
+                existing_job = existing_jobs.get(job_id)
+                if existing_job and self._task_hashes.get(job_id) == task_hash:
                     continue
 
                 new_trigger_obj = self._create_trigger_from_schedule(schedule_frequency, task_id)
                 if not new_trigger_obj:
                     continue # Unsupported schedule, already logged
 
-                # Wrapper function for scheduler, captures self and task_id
-                # The actual sync execution (perform_database_sync) is called within the wrapper
-                job_func_for_scheduler = lambda current_task_id=task_id: threading.Thread(target=self._perform_database_sync_wrapper, args=(current_task_id,)).start()
-                
-                existing_job = scheduler.get_job(job_id)
-
                 if existing_job:
                     if overwrite: # This branch is primarily for _reload_config
                         logger.info(f"Job {job_id} ({task_name}) exists. Overwrite=True. Checking for trigger changes.")
@@ -265,29 +513,30 @@ class DatabaseSync:
                         if needs_reschedule:
                             logger.info(f"Job {job_id} trigger requires update. Rescheduling. Old: {current_job_trigger}, New: {new_trigger_obj}")
                             try:
-                                scheduler.reschedule_job(job_id, trigger=new_trigger_obj)
+                                rescheduled_job = scheduler.reschedule_job(job_id, trigger=new_trigger_obj)
                                 # Note: func is not changed here, wrapper handles payload changes
-                                logger.info(f"Job {job_id} rescheduled. Next run: {scheduler.get_job(job_id).next_run_time if scheduler.get_job(job_id) else 'N/A'}")
+                                logger.info(f"Job {job_id} rescheduled. Next run: {getattr(rescheduled_job, 'next_run_time', 'N/A')}")
+                                self._task_hashes[job_id] = task_hash
                             except Exception as e_reschedule:
                                 logger.error(f"Error rescheduling job {job_id}: {e_reschedule}. Attempting replace.", exc_info=True)
                                 try: # Fallback to replace if reschedule fails (e.g., job disappeared)
-                                    scheduler.add_job(job_func_for_scheduler, trigger=new_trigger_obj, id=job_id, replace_existing=True)
-                                    logger.info(f"Job {job_id} replaced after reschedule error. Next run: {scheduler.get_job(job_id).next_run_time if scheduler.get_job(job_id) else 'N/A'}")
+                                    replaced_job = scheduler.add_job(self._submit_sync, trigger=new_trigger_obj, id=job_id, args=[task_id], replace_existing=True)
+                                    logger.info(f"Job {job_id} replaced after reschedule error. Next run: {getattr(replaced_job, 'next_run_time', 'N/A')}")
+                                    self._task_hashes[job_id] = task_hash
                                 except Exception as e_replace_fallback:
                                     logger.error(f"Error replacing job {job_id} after reschedule error: {e_replace_fallback}", exc_info=True)
                         else:
                             logger.info(f"Job {job_id} trigger is effectively unchanged ({current_job_trigger}). No reschedule needed. Payload changes handled by wrapper at runtime. Next run: {existing_job.next_run_time}")
-                            # Ensure the function is up-to-date if it somehow changed, though with lambda capturing task_id, it should be stable.
-                            # This modify_job might not be strictly necessary if func definition is stable.
-                            # scheduler.modify_job(job_id, func=job_func_for_scheduler)
+                            self._task_hashes[job_id] = task_hash
                     else: # Job exists but overwrite is False (initial setup_jobs call)
                         logger.info(f"Job {job_id} ({task_name}) already exists during initial setup (overwrite=false). Skipping.")
                 else: # Job does not exist, add it
                     logger.info(f"Job {job_id} ({task_name}) does not exist. Adding new job for schedule: {schedule_frequency}")
                     try:
-                        scheduler.add_job(job_func_for_scheduler, trigger=new_trigger_obj, id=job_id, replace_existing=False)
+                        scheduler.add_job(self._submit_sync, trigger=new_trigger_obj, id=job_id, args=[task_id], replace_existing=False)
                         # Simpler log for newly added job, as next_run_time might not be immediately available on the direct return or on the object from add_job itself before scheduler processes it.
                         logger.info(f"Job {job_id} ({task_name}) submitted to scheduler with trigger: {new_trigger_obj}. Next run time will be determined by scheduler.")
+                        self._task_hashes[job_id] = task_hash
                     except Exception as e_add_new:
                         logger.error(f"Error adding new job {job_id}: {e_add_new}", exc_info=True)
 
@@ -304,6 +553,7 @@ class DatabaseSync:
         for job_id_to_remove in current_job_ids - db_task_ids_to_schedule:
             try: 
                 scheduler.remove_job(job_id_to_remove)
+                self._task_hashes.pop(job_id_to_remove, None)
                 logger.info(f"Removed stale/disabled job from scheduler: {job_id_to_remove}")
             except Exception as e: 
                 logger.warning(f"Error removing job {job_id_to_remove} during reload: {e}")
@@ -330,21 +580,78 @@ class DatabaseSync:
         self._schedule_tasks(db_tasks, overwrite=False)
 
 # --- DB Log/Update Functions (Global, as they use their own connections) ---
-def update_sync_log(task_id: int, start_time: datetime, end_time: datetime, status: str, message: str = "", rows_synced: int = 0):
-    try:
-        with sqlite3.connect(BACKEND_DB_PATH) as conn:
-            conn.execute("INSERT INTO sync_logs (task_id, start_time, end_time, status, message, rows_synced) VALUES (?,?,?,?,?,?)",(task_id, start_time.isoformat(), end_time.isoformat(), status, message, rows_synced))
-            conn.commit()
-        logger.info(f"Logged sync: Task {task_id}, Status {status}")
-    except Exception as e: logger.error(f"Log update error task {task_id}: {e}")
-
-def update_last_sync_time(task_id: int, sync_time: datetime):
+# Sync log rows and last_sync updates are queued and written by flush_sync_logs,
+# so a finished sync costs one shared transaction instead of one commit per statement.
+# Only the process that started the scheduler runs the flusher job. Under gunicorn --preload that is
+# the master, while /trigger_sync syncs run in the worker, so every other process writes immediately.
+SYNC_LOG_FLUSH_SECONDS = 10
+scheduler_pid: Optional[int] = None # Set once scheduler.start() succeeds
+pending_sync_logs: "queue.Queue[Tuple[int, str, str, str, str, int]]" = queue.Queue()
+pending_last_sync: Dict[int, Tuple[str, str]] = {} # task_id -> (last_sync, updated_at); latest wins
+pending_last_sync_lock = threading.Lock()
+
+def _owns_sync_log_flusher() -> bool:
+    return scheduler_pid == os.getpid()
+
+def write_sync_logs(rows: List[Tuple[int, str, str, str, str, int]], last_syncs: Dict[int, Tuple[str, str]]):
+    with db_connection() as conn:
+        conn.executemany("UPDATE sync_tasks SET last_sync = ?, updated_at = ? WHERE id = ?", [(ls, ua, tid) for tid, (ls, ua) in last_syncs.items()])
+        conn.executemany("INSERT INTO sync_logs (task_id, start_time, end_time, status, message, rows_synced) VALUES (?,?,?,?,?,?)", rows)
+
+def update_sync_log(task_id: int, start_time: datetime, end_time: datetime, status: str, message: str = "", rows_synced: int = 0, last_sync_time: Optional[datetime] = None):
+    """Record a sync log row and, when last_sync_time is given, the task's last_sync; both land in one transaction."""
+    row = (task_id, start_time.isoformat(), end_time.isoformat(), status, message, rows_synced)
+    last_syncs = {task_id: (last_sync_time.isoformat(), datetime.now(timezone.utc).isoformat())} if last_sync_time else {}
+    if not _owns_sync_log_flusher():
+        try:
+            write_sync_logs([row], last_syncs)
+            logger.info(f"Logged sync: Task {task_id}, Status {status}")
+        except Exception as e: logger.error(f"Log update error task {task_id}: {e}")
+        return
+    pending_sync_logs.put(row)
+    if last_syncs:
+        with pending_last_sync_lock:
+            pending_last_sync.update(last_syncs)
+    logger.info(f"Queued sync log: Task {task_id}, Status {status}")
+
+def flush_sync_logs():
+    rows = []
+    while True:
+        try: rows.append(pending_sync_logs.get_nowait())
+        except queue.Empty: break
+    with pending_last_sync_lock:
+        last_syncs = dict(pending_last_sync)
+        pending_last_sync.clear()
+    if not rows and not last_syncs: return
     try:
-        with sqlite3.connect(BACKEND_DB_PATH) as conn:
-            conn.execute("UPDATE sync_tasks SET last_sync = ?, updated_at = ? WHERE id = ?", (sync_time.isoformat(), datetime.now(timezone.utc).isoformat(), task_id))
-            conn.commit()
-        logger.info(f"Updated last_sync for task {task_id}")
-    except Exception as e: logger.error(f"Last_sync update error task {task_id}: {e}")
+        write_sync_logs(rows, last_syncs)
+        logger.info(f"Flushed {len(rows)} sync log(s) and {len(last_syncs)} last_sync update(s).")
+    except Exception as e:
+        logger.error(f"Log flush error, requeueing {len(rows)} log(s) and {len(last_syncs)} last_sync update(s): {e}")
+        for row in rows: pending_sync_logs.put(row)
+        with pending_last_sync_lock:
+            for tid, values in last_syncs.items(): pending_last_sync.setdefault(tid, values) # Keep newer updates queued meanwhile
+
+def _reset_state_after_fork():
+    # gunicorn --preload forks workers after import. SQLite connections must not be used across fork(),
+    # so the child starts with an empty pool, and the parent keeps (and flushes) whatever it had queued.
+    global _db_pool, pending_sync_logs, pending_last_sync, pending_last_sync_lock, system_info_lock, metrics_lock, sync_executor, node_callback_session
+    while True:
+        try: _inherited_db_connections.append(_db_pool.get_nowait()) # Kept referenced, never used or closed, in the child
+        except queue.Empty: break
+    _db_pool = queue.LifoQueue(maxsize=DB_POOL_SIZE)
+    pending_sync_logs = queue.Queue()
+    pending_last_sync = {}
+    pending_last_sync_lock = threading.Lock()
+    system_info_lock = threading.Lock() # These may have been held by a parent thread at fork time
+    metrics_lock = threading.Lock()
+    # The parent's pool threads don't exist here, but its idle-thread bookkeeping would stop new ones from starting
+    sync_executor = ThreadPoolExecutor(max_workers=SYNC_MAX_WORKERS, thread_name_prefix="sync-worker")
+    # Don't share the parent's keep-alive sockets to the Node.js backend (or its possibly held urllib3 pool locks)
+    node_callback_session = _make_callback_session()
+
+_inherited_db_connections: List[sqlite3.Connection] = []
+os.register_at_fork(after_in_child=_reset_state_after_fork)
 
 # --- Main Sync Execution Logic --- (Remains mostly the same)
 def perform_database_sync(task_payload: Dict):
@@ -353,14 +660,14 @@ def perform_database_sync(task_payload: Dict):
     target_conn_payload = task_payload['target']
     options = {"tables_only": task_payload.get('tables')}
     logger.info(f"[TASK {task_id}] perform_database_sync called.")
+    start_time = datetime.now(timezone.utc) # Taken once; early-abort paths log it as both start and end
 
     source_password_to_use = source_conn_payload.get('password')
     dec_src_pass = decrypt_password(source_password_to_use) if source_password_to_use and ':' in source_password_to_use else source_password_to_use
     if source_password_to_use and ':' in source_password_to_use and dec_src_pass is None:
         logger.error(f"[TASK {task_id}] Failed to decrypt source password. Aborting.")
         # Prepare for callback even on early exit
-        start_time_for_log = datetime.now(timezone.utc)
-        end_time_for_log = datetime.now(timezone.utc)
+        start_time_for_log = end_time_for_log = start_time
         status_for_log = "error"
         message_for_log = "Decrypt source pass failed"
         rows_synced_for_log = 0
@@ -375,7 +682,7 @@ def perform_database_sync(task_payload: Dict):
                 "start_time": start_time_for_log.isoformat(),
                 "end_time": end_time_for_log.isoformat()
             }
-            requests.post(NODE_BACKEND_JOB_STATUS_URL, json=callback_payload, timeout=10)
+            node_callback_session.post(NODE_BACKEND_JOB_STATUS_URL, json=callback_payload, timeout=10)
             logger.info(f"[TASK {task_id}] Successfully sent job status update to Node.js backend after decryption error.")
         except Exception as cb_exc:
             logger.error(f"[TASK {task_id}] Failed to send job status update to Node.js backend after decryption error: {cb_exc}")
@@ -386,8 +693,7 @@ def perform_database_sync(task_payload: Dict):
     dec_tgt_pass = decrypt_password(target_password_to_use) if target_password_to_use and ':' in target_password_to_use else target_password_to_use
     if target_password_to_use and ':' in target_password_to_use and dec_tgt_pass is None:
         logger.error(f"[TASK {task_id}] Failed to decrypt target password. Aborting.")
-        start_time_for_log = datetime.now(timezone.utc) # Assuming error happened before any real start
-        end_time_for_log = datetime.now(timezone.utc)
+        start_time_for_log = end_time_for_log = start_time # Error happened before any real start
         status_for_log = "error"
         message_for_log = "Decrypt target pass failed"
         rows_synced_for_log = 0
@@ -401,7 +707,7 @@ def perform_database_sync(task_payload: Dict):
                 "start_time": start_time_for_log.isoformat(),
                 "end_time": end_time_for_log.isoformat()
             }
-            requests.post(NODE_BACKEND_JOB_STATUS_URL, json=callback_payload, timeout=10)
+            node_callback_session.post(NODE_BACKEND_JOB_STATUS_URL, json=callback_payload, timeout=10)
             logger.info(f"[TASK {task_id}] Successfully sent job status update to Node.js backend after decryption error.")
         except Exception as cb_exc:
             logger.error(f"[TASK {task_id}] Failed to send job status update to Node.js backend after decryption error: {cb_exc}")
@@ -409,21 +715,23 @@ def perform_database_sync(task_payload: Dict):
     target_conn_payload['password'] = dec_tgt_pass
     
     source_engine = source_conn_payload.get("engine", "").lower()
+    source_engine = ENGINE_ALIASES.get(source_engine, source_engine)
     target_engine = target_conn_payload.get("engine", "").lower()
-    start_time = datetime.now(timezone.utc)
+    target_engine = ENGINE_ALIASES.get(target_engine, target_engine)
     status = "error"; message = ""; rows_synced = 0 # Initialize for the finally block
     end_time = start_time # Initialize end_time
+    last_sync_time = None # Set only on success
     try:
-        if source_engine == "postgresql" and target_engine == "postgresql":
-            status, message, rows_synced = sync_postgresql_to_postgresql(task_id, source_conn_payload, target_conn_payload, options)
-        else: 
+        sync_handler = SYNC_HANDLERS.get((source_engine, target_engine)) # Validation and dispatch in one lookup
+        if sync_handler is None:
             message = f"Unsupported sync: {source_engine} to {target_engine}"
             status = "error"
             raise NotImplementedError(message)
+        status, message, rows_synced = sync_handler(task_id, source_conn_payload, target_conn_payload, options)
         
         end_time = datetime.now(timezone.utc)
         if status == "success": 
-            update_last_sync_time(task_id, start_time) # or end_time, depending on definition of last_sync
+            last_sync_time = start_time # or end_time, depending on definition of last_sync; written with the log row
             logger.info(f"[TASK {task_id}] Sync success.")
         else: 
             logger.error(f"[TASK {task_id}] Sync failed. Status: {status}, Msg: {message}")
@@ -433,7 +741,7 @@ def perform_database_sync(task_payload: Dict):
         end_time = datetime.now(timezone.utc)
         logger.error(f"[TASK {task_id}] Sync exception: {e}", exc_info=True)
     finally: 
-        update_sync_log(task_id, start_time, end_time, status, message, rows_synced)
+        update_sync_log(task_id, start_time, end_time, status, message, rows_synced, last_sync_time=last_sync_time)
         # Attempt to send status update back to Node.js backend
         try:
             callback_payload = {
@@ -445,7 +753,7 @@ def perform_database_sync(task_payload: Dict):
                 "end_time": end_time.isoformat()
             }
             logger.info(f"[TASK {task_id}] Sending job status update to Node.js backend: {callback_payload}")
-            response = requests.post(NODE_BACKEND_JOB_STATUS_URL, json=callback_payload, timeout=10) # 10 second timeout
+            response = node_callback_session.post(NODE_BACKEND_JOB_STATUS_URL, json=callback_payload, timeout=10) # 10 second timeout
             response.raise_for_status() # Raise an exception for HTTP errors (4xx or 5xx)
             logger.info(f"[TASK {task_id}] Successfully sent job status update to Node.js backend. Response: {response.status_code}")
         except requests.exceptions.RequestException as cb_exc:
@@ -453,6 +761,32 @@ def perform_database_sync(task_payload: Dict):
         except Exception as gen_cb_exc:
             logger.error(f"[TASK {task_id}] An unexpected error occurred while sending job status update: {gen_cb_exc}")
 
+# --- Subprocess Helpers ---
+def run_piped(producer_cmd: List[str], producer_env: Dict, consumer_cmd: List[str], consumer_env: Dict):
+    """Run `producer | consumer` without an intermediate file; raises CalledProcessError like check=True."""
+    producer = subprocess.Popen(producer_cmd, env=producer_env, stdout=subprocess.PIPE)
+    try:
+        consumer = subprocess.Popen(consumer_cmd, env=consumer_env, stdin=producer.stdout)
+    except Exception:
+        producer.kill(); producer.wait()
+        raise
+    finally:
+        producer.stdout.close() # Only the consumer holds the read end, so it sees EOF / SIGPIPE propagates
+    consumer_rc = consumer.wait()
+    producer_rc = producer.wait()
+    if consumer_rc != 0: raise subprocess.CalledProcessError(consumer_rc, consumer_cmd) # A failed consumer also SIGPIPEs the producer
+    if producer_rc != 0: raise subprocess.CalledProcessError(producer_rc, producer_cmd)
+
+# --- PostgreSQL Command Builders ---
+PG_DUMP_OPTIONS = ('--no-owner', '--no-acl', '--no-comments',
+                   '--exclude-schema=_timescaledb_internal', '--exclude-schema=_timescaledb_catalog',
+                   '--exclude-schema=_timescaledb_config', '--exclude-schema=timescaledb_information')
+PSQL_OPTIONS = ('-qtAX',)
+
+def build_pg_cmd(program: str, host: str, port: Union[str, int], username: str, dbname: str, *extra_args: str) -> List[str]:
+    """Assemble a pg_dump/pg_restore/psql argument list for one connection in a single allocation."""
+    return [program, '--host', host, '--port', str(port), '--username', username, '--dbname', dbname, *extra_args]
+
 # --- Specific Sync Implementations (e.g., sync_postgresql_to_postgresql) ---
 # This function definition should be identical to the one you confirmed was working for manual syncs.
 # It uses the already decrypted passwords from the 'source' and 'target' dicts in task_payload.
@@ -470,127 +804,127 @@ def sync_postgresql_to_postgresql(task_id: int, source: Dict, target: Dict, opti
     tgt_admin_pass = os.getenv('DEFAULT_PG_ADMIN_PASSWORD', '')
     tgt_user = target['username']; tgt_pass = target.get('password', '') 
     tgt_host = target['host']; tgt_port = str(target['port']); tgt_db_name = target['database']
-    dump_file = f"/tmp/pg_dump_task_{task_id}_{datetime.now(timezone.utc).strftime('%Y%m%d%H%M%S')}.dump"
     rows_synced = 0
-    pg_dump_cmd_base = ['pg_dump', '--host', source['host'], '--port', str(source['port']), '--username', source['username'], '--dbname', source['database'], '--format=custom', '--file', dump_file, '--no-owner', '--no-acl', '--no-comments']
-    pg_dump_cmd_base.extend(['--exclude-schema=_timescaledb_internal', '--exclude-schema=_timescaledb_catalog', '--exclude-schema=_timescaledb_config', '--exclude-schema=timescaledb_information'])
-    pg_dump_cmd_schema_other_data = list(pg_dump_cmd_base) + ['--exclude-table-data=public.sensor_readings']
-    psql_admin_maintenance_cmd_base = ['psql', '--host', tgt_host, '--port', tgt_port, '--username', tgt_admin_user, '--dbname', 'postgres', '-qtAX']
-    psql_admin_target_db_cmd_base = ['psql', '--host', tgt_host, '--port', tgt_port, '--username', tgt_admin_user, '--dbname', tgt_db_name, '-qtAX']
-    psql_user_cmd_base_for_target_db = ['psql', '--host', tgt_host, '--port', tgt_port, '--username', tgt_user, '--dbname', tgt_db_name, '-qtAX']
+    # With PG_SYNC_JOBS > 1 tables are dumped/restored in parallel via a directory-format dump;
+    # otherwise a custom-format dump is streamed straight into pg_restore (no /tmp dump file)
+    dump_dir = f"/tmp/pg_dump_task_{task_id}_{datetime.now(timezone.utc).strftime('%Y%m%d%H%M%S')}.d" if PG_SYNC_JOBS > 1 else None
+    dump_format_args = ['--format=directory', f'--jobs={PG_SYNC_JOBS}', '--file', dump_dir] if dump_dir else ['--format=custom']
+    pg_dump_cmd_schema_other_data = build_pg_cmd('pg_dump', source['host'], source['port'], source['username'], source['database'],
+                                                 *dump_format_args, *PG_DUMP_OPTIONS, '--exclude-table-data=public.sensor_readings')
+    psql_admin_maintenance_cmd_base = build_pg_cmd('psql', tgt_host, tgt_port, tgt_admin_user, 'postgres', *PSQL_OPTIONS)
+    psql_admin_target_db_cmd_base = build_pg_cmd('psql', tgt_host, tgt_port, tgt_admin_user, tgt_db_name, *PSQL_OPTIONS)
+    psql_user_cmd_base_for_target_db = build_pg_cmd('psql', tgt_host, tgt_port, tgt_user, tgt_db_name, *PSQL_OPTIONS)
     source_env = os.environ.copy(); source_env['PGPASSWORD'] = source.get('password', '')
     target_admin_env = os.environ.copy(); target_admin_env['PGPASSWORD'] = tgt_admin_pass
     target_user_env = os.environ.copy(); target_user_env['PGPASSWORD'] = tgt_pass
     try:
-        subprocess.run(psql_admin_maintenance_cmd_base + ['-c', f'DROP DATABASE IF EXISTS "{tgt_db_name}" WITH (FORCE);'], env=target_admin_env, check=False)
-        subprocess.run(psql_admin_maintenance_cmd_base + ['-c', f'CREATE DATABASE "{tgt_db_name}" OWNER "{tgt_user}";'], env=target_admin_env, check=True)
+        # Consecutive statements for the same user/db are fed to one psql session via stdin instead of one `psql -c` each.
+        # Statements before `\set ON_ERROR_STOP on` may fail (previously check=False), later ones abort the script.
+        recreate_db_sql = f'DROP DATABASE IF EXISTS "{tgt_db_name}" WITH (FORCE);\n\\set ON_ERROR_STOP on\nCREATE DATABASE "{tgt_db_name}" OWNER "{tgt_user}";\n'
+        subprocess.run(psql_admin_maintenance_cmd_base, input=recreate_db_sql, text=True, env=target_admin_env, check=True)
         subprocess.run(psql_user_cmd_base_for_target_db + ['-c', "CREATE EXTENSION IF NOT EXISTS timescaledb SCHEMA public;"], env=target_user_env, check=True)
         subprocess.run(psql_admin_target_db_cmd_base + ['-c', "SELECT timescaledb_pre_restore();SET client_min_messages TO WARNING;"], env=target_admin_env, check=True)
-        subprocess.run(pg_dump_cmd_schema_other_data, env=source_env, check=True, capture_output=False)
-        pg_restore_cmd = ['pg_restore', '--host', tgt_host, '--port', tgt_port, '--username', tgt_user, '--dbname', tgt_db_name, '--no-owner', '-v', dump_file]
-        subprocess.run(pg_restore_cmd, env=target_user_env, check=True, capture_output=False)
-        drop_trigger_sql = "DROP TRIGGER IF EXISTS ts_insert_blocker ON public.sensor_readings;"
-        subprocess.run(psql_user_cmd_base_for_target_db + ['-c', drop_trigger_sql], env=target_user_env, check=False)
-        create_hypertable_sql = "SELECT create_hypertable('public.sensor_readings', 'time', if_not_exists => TRUE, migrate_data => FALSE);"
-        ch_res = subprocess.run(psql_user_cmd_base_for_target_db + ['-c', create_hypertable_sql], env=target_user_env, check=True, capture_output=True, text=True)
+        pg_restore_cmd = build_pg_cmd('pg_restore', tgt_host, tgt_port, tgt_user, tgt_db_name, '--no-owner', '-v')
+        if dump_dir:
+            subprocess.run(pg_dump_cmd_schema_other_data, env=source_env, check=True)
+            subprocess.run(pg_restore_cmd + [f'--jobs={PG_SYNC_JOBS}', dump_dir], env=target_user_env, check=True)
+        else:
+            run_piped(pg_dump_cmd_schema_other_data, source_env, pg_restore_cmd, target_user_env)
+        hypertable_setup_sql = (
+            "DROP TRIGGER IF EXISTS ts_insert_blocker ON public.sensor_readings;\n"
+            "\\set ON_ERROR_STOP on\n"
+            "SELECT create_hypertable('public.sensor_readings', 'time', if_not_exists => TRUE, migrate_data => FALSE);\n"
+        )
+        ch_res = subprocess.run(psql_user_cmd_base_for_target_db, input=hypertable_setup_sql, env=target_user_env, check=True, capture_output=True, text=True)
         if ch_res.returncode != 0: raise Exception(f"create_hypertable failed: {ch_res.stderr}")
         hypertable_to_copy = 'public.sensor_readings'
-        csv_path = f"/tmp/{hypertable_to_copy.split('.')[-1]}_data_task_{task_id}.csv"
         subprocess.run(psql_admin_target_db_cmd_base + ['-c', f'ALTER DATABASE "{tgt_db_name}" SET timescaledb.restoring = \'off\';'], env=target_admin_env, check=True)
         try:
-            psql_source_cmd_base = ['psql', '--host', source['host'], '--port', str(source['port']), '--username', source['username'], '--dbname', source['database'], '-qtAX']
-            copy_to_sql = f"\\COPY (SELECT * FROM {hypertable_to_copy}) TO '{csv_path}' WITH CSV HEADER"
-            subprocess.run(psql_source_cmd_base + ['-c', copy_to_sql], env=source_env, check=True)
-            if os.path.exists(csv_path):
-                copy_from_sql = f"\\COPY {hypertable_to_copy} FROM '{csv_path}' WITH CSV HEADER"
-                subprocess.run(psql_user_cmd_base_for_target_db + ['-c', copy_from_sql], env=target_user_env, check=True)
+            psql_source_cmd_base = build_pg_cmd('psql', source['host'], source['port'], source['username'], source['database'], *PSQL_OPTIONS)
+            # Binary COPY piped source -> target: no CSV text encoding and no temp file on disk
+            copy_to_sql = f"COPY (SELECT * FROM {hypertable_to_copy}) TO STDOUT WITH (FORMAT binary)"
+            copy_from_sql = f"COPY {hypertable_to_copy} FROM STDIN WITH (FORMAT binary)"
+            run_piped(psql_source_cmd_base + ['-c', copy_to_sql], source_env, psql_user_cmd_base_for_target_db + ['-c', copy_from_sql], target_user_env)
         finally:
             subprocess.run(psql_admin_target_db_cmd_base + ['-c', f'ALTER DATABASE "{tgt_db_name}" SET timescaledb.restoring = \'on\';'], env=target_admin_env, check=True)
-            if os.path.exists(csv_path): os.remove(csv_path)
         subprocess.run(psql_admin_target_db_cmd_base + ['-c', "SELECT timescaledb_post_restore();"], env=target_admin_env, check=True)
         return "success", "PostgreSQL sync completed.", rows_synced
     except subprocess.CalledProcessError as e: return "error", f"Sync CMD failed: {e.stderr}", 0
     except Exception as e: return "error", str(e), 0
     finally:
-        if os.path.exists(dump_file): logger.info(f"Kept dump: {dump_file}")
+        if dump_dir: shutil.rmtree(dump_dir, ignore_errors=True)
+
+# (source_engine, target_engine) -> sync implementation, using normalized engine names
+SYNC_HANDLERS = {
+    ("postgresql", "postgresql"): sync_postgresql_to_postgresql,
+}
 
 # --- Flask API Endpoints ---
+def run_manual_sync(task_payload: Dict, lock_file: Optional[IO]):
+    try:
+        perform_database_sync(task_payload)
+    finally:
+        if lock_file: lock_file.close() # Releases the task lock taken by the request
+
 @app.route('/trigger_sync', methods=['POST'])
 def trigger_sync_endpoint():
     # ... (this endpoint remains largely the same, calls perform_database_sync with payload from Node.js) ...
-    if not request.is_json: return jsonify({"error": "Request must be JSON"}), 400
+    if not request.is_json: return json_response({"error": "Request must be JSON"}, 400)
     data = request.get_json()
     task_id = data.get('taskId')
     if not task_id or not data.get('source') or not data.get('target'):
-        return jsonify({"error": "Missing taskId, source, or target"}), 400
+        return json_response({"error": "Missing taskId, source, or target"}, 400)
+    try: lock_task_id = int(task_id) # Also names the lock file, so only plain ids are accepted
+    except (TypeError, ValueError): return json_response({"error": "taskId must be an integer"}, 400)
     logger.info(f"Received sync trigger request for Task ID: {task_id}")
+    # Same lock as scheduled runs, so a manual run can't overlap a scheduled DROP/restore of the same target
+    acquired, lock_file = acquire_task_lock(lock_task_id)
+    if not acquired:
+        return json_response({"message": f"Sync task {task_id} is already running."}, 409)
     try:
-        threading.Thread(target=perform_database_sync, args=(data,), daemon=True).start()
-        return jsonify({"message": f"Sync task {task_id} started."}), 202
-    except Exception as e: return jsonify({"error": f"Failed to start sync: {e}"}), 500
+        sync_executor.submit(run_manual_sync, data, lock_file)
+        return json_response({"message": f"Sync task {task_id} started."}, 202)
+    except Exception as e:
+        if lock_file: lock_file.close()
+        return json_response({"error": f"Failed to start sync: {e}"}, 500)
 
 @app.route('/api/system/performance-history', methods=['GET'])
 def get_performance_history_endpoint():
     # ... (this endpoint remains the same) ...
     metric = request.args.get('metric'); limit = request.args.get('limit',default=MAX_HISTORY,type=int)
-    return jsonify({'success':True,'metric':metric,'history':metrics_history[metric][-limit:]}) if metric in metrics_history else (jsonify({'success':False,'message':f'Invalid metric. Avail: {list(metrics_history.keys())}'}),400)
+    record_metrics_if_due()
+    if metric not in metrics_history:
+        return json_response({'success':False,'message':f'Invalid metric. Avail: {list(metrics_history.keys())}'}, 400)
+    return json_response({'success':True,'metric':metric,'history':list(metrics_history[metric])[-limit:]})
 
 @app.route('/api/system/info', methods=['GET'])
 def get_system_info_endpoint():
     try:
-        cpu_usage = psutil.cpu_percent(interval=0.1) # Percentage
-        
-        memory_info = psutil.virtual_memory()
-        memory_usage_percent = memory_info.percent
-        memory_used_gb = round(memory_info.used / (1024**3), 1)
-        memory_total_gb = round(memory_info.total / (1024**3), 1)
-        
-        disk_info = psutil.disk_usage('/') # For root disk. Change path if needed.
-        disk_usage_percent = disk_info.percent
-        disk_used_gb = round(disk_info.used / (1024**3), 1)
-        disk_total_gb = round(disk_info.total / (1024**3), 1)
-        
-        swap_info = psutil.swap_memory()
-        swap_usage_percent = swap_info.percent
-        swap_used_gb = round(swap_info.used / (1024**3), 1)
-        swap_total_gb = round(swap_info.total / (1024**3), 1)
-        
-        boot_time_timestamp = psutil.boot_time()
-        current_time_timestamp = time.time()
-        uptime_seconds = current_time_timestamp - boot_time_timestamp
-        
+        snapshot = get_system_info_snapshot()
+        record_metrics_if_due() # The dashboard polls this endpoint, which keeps the history filled while it is open
+
+        uptime_seconds = time.time() - BOOT_TIME
         days = int(uptime_seconds // (24 * 3600))
         hours = int((uptime_seconds % (24 * 3600)) // 3600)
         minutes = int((uptime_seconds % 3600) // 60)
         uptime_str = f"{days} days, {hours} hours, {minutes} minutes"
-        
-        current_time_iso = datetime.now(timezone.utc).isoformat()
 
         system_info = {
-            "cpuUsage": round(cpu_usage, 1),
-            "memoryUsagePercent": round(memory_usage_percent, 1),
-            "memoryUsed": f"{memory_used_gb} GB",
-            "memoryTotal": f"{memory_total_gb} GB",
-            "diskUsagePercent": round(disk_usage_percent, 1),
-            "diskUsed": f"{disk_used_gb} GB",
-            "diskTotal": f"{disk_total_gb} GB",
-            "swapUsagePercent": round(swap_usage_percent, 1),
-            "swapUsed": f"{swap_used_gb} GB",
-            "swapTotal": f"{swap_total_gb} GB",
+            **snapshot,
             "uptime": uptime_str,
             "rawUptimeSeconds": int(uptime_seconds), # Frontend also has a rawUptimeSeconds
-            "currentTime": current_time_iso
+            "currentTime": datetime.now(timezone.utc).isoformat()
         }
-        return jsonify(system_info), 200
-        
+        return json_response(system_info, 200)
+
     except Exception as e:
         logger.error(f"Error fetching system info: {e}", exc_info=True)
-        return jsonify({"error": "Failed to fetch system information", "details": str(e)}), 500
+        return json_response({"error": "Failed to fetch system information", "details": str(e)}, 500)
 
 # --- Application Initialization for Gunicorn ---
-if not scheduler.get_job('metric_collector'): # Ensure job isn't added multiple times by Gunicorn workers
-    scheduler.add_job(collect_metrics, 'interval', minutes=1, id='metric_collector')
-    logger.info("Scheduled metrics collection.")
+if not scheduler.get_job('sync_log_flusher'):
+    scheduler.add_job(flush_sync_logs, 'interval', seconds=SYNC_LOG_FLUSH_SECONDS, id='sync_log_flusher')
+    logger.info("Scheduled sync log flushing.")
 
 # Global instance of DatabaseSync created when module is loaded by Gunicorn worker
 sync_manager_instance = None
@@ -603,11 +937,15 @@ except Exception as e:
 if not scheduler.running:
     try:
         scheduler.start()
+        scheduler_pid = os.getpid()
         logger.info("APScheduler started by main application module.")
     except Exception as e: 
         logger.error(f"CRITICAL: Failed to start global APScheduler: {e}", exc_info=True)
 
 # Ensure scheduler shuts down gracefully when the app exits (Gunicorn handles worker exit)
 atexit.register(lambda: scheduler.shutdown(wait=False) if scheduler.running else None)
+atexit.register(lambda: sync_executor.shutdown(wait=False)) # Looked up at exit; a forked worker has its own executor
+# Write out any sync log rows still queued when the scheduler process exits
+atexit.register(flush_sync_logs)
 
 # logger.info(f"Flask app '{__name__}' (sync_manager.py) is ready to be served by Gunicorn.")
\ No newline at end of file